@@ -18,7 +18,9 @@
 
 from __future__ import print_function
 from __future__ import absolute_import
+import collections
 import importlib
+import random
 import time
 import warnings
 
@@ -54,6 +56,21 @@ def _sanitize(value):
 
 
 class DefaultWaitTimeStrategy(object):
+    """Wait for the Retry-After delay, or back off exponentially.
+
+    When the server does not send a Retry-After header the wait time is
+    picked at random between 0 and the exponential backoff delay, so that
+    clients throttled at the same time don't all retry at the same time.
+
+    Args:
+        max_retry_wait (float): Upper bound for the wait time, whether it
+            comes from the Retry-After header or from the backoff. None
+            means no upper bound
+    """
+
+    def __init__(self, max_retry_wait=30):
+        self.max_retry_wait = max_retry_wait
+
     def __call__(self, response, retries):
         """Return wait time before next retry
 
@@ -67,9 +84,9 @@ class DefaultWaitTimeStrategy(object):
 
         wait_time = self._get_from_response(response)
         if wait_time is None:
-            wait_time = self._calculate_wait_time(response, retries)
+            return self._calculate_wait_time(response, retries)
 
-        return wait_time
+        return self._cap(wait_time)
 
     def _get_from_response(self, response):
         value = response.headers.get("Retry-After")
@@ -79,7 +96,13 @@ class DefaultWaitTimeStrategy(object):
         return int(value)
 
     def _calculate_wait_time(self, response, retries):
-        return 2 ** retries * 0.1
+        return random.uniform(0, self._cap(2 ** retries * 0.1))
+
+    def _cap(self, wait_time):
+        if self.max_retry_wait is None:
+            return wait_time
+
+        return min(self.max_retry_wait, wait_time)
 
 
 class RequestThrottler(object):
@@ -87,25 +110,25 @@ class RequestThrottler(object):
         self.max_requests_per_period = max_requests_per_period
         self.period = period
 
-        self.calls_within_period = []
+        self.calls_within_period = collections.deque()
 
     def __call__(self):
-        current_time = time.monotonic()
+        current_time = time.perf_counter()
 
         cutoff_time = current_time - self.period
         self._remove_calls_before(cutoff_time)
 
         if len(self.calls_within_period) >= self.max_requests_per_period:
-            new_cutoff_time = self.calls_within_period.pop(0) + 1
-            self._remove_calls_before(current_time - self.period)
-
+            new_cutoff_time = self.calls_within_period.popleft() + 1
             self._wait(new_cutoff_time - cutoff_time)
+            current_time = time.perf_counter()
 
-        self.calls_within_period.append(time.monotonic())
+        self.calls_within_period.append(current_time)
 
     def _remove_calls_before(self, cutoff_time):
-        while self.calls_within_period and self.calls_within_period[0] < cutoff_time:
-            self.calls_within_period.pop(0)
+        calls = self.calls_within_period
+        while calls and calls[0] < cutoff_time:
+            calls.popleft()
 
     def _wait(self, wait_time):
         time.sleep(wait_time)
@@ -130,6 +153,9 @@ class Gitlab(object):
         api_version (str): Gitlab API version to use (support for 4 only)
         get_wait_time (callable): Callable returning number of seconds to wait
             until next retry
+        max_retry_wait (float): Maximum number of seconds to wait between
+            retries with the default wait time strategy, or None to wait
+            as long as the server asks
     """
 
     def __init__(
@@ -147,6 +173,7 @@ class Gitlab(object):
         per_page=None,
         get_wait_time=None,
         throttle_requests=None,
+        max_retry_wait=30,
     ):
 
         self._api_version = str(api_version)
@@ -173,7 +200,7 @@ class Gitlab(object):
 
         self.per_page = per_page
 
-        self._get_wait_time = get_wait_time or DefaultWaitTimeStrategy()
+        self._get_wait_time = get_wait_time or DefaultWaitTimeStrategy(max_retry_wait)
         self._throttle_requests = throttle_requests or RequestThrottler()
 
         objects = importlib.import_module("gitlab.v%s.objects" % self._api_version)
@@ -16,21 +16,39 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import copy
+import functools
 import os
 import pickle
+import re
 import tempfile
-import json
+import types
 import unittest
 import unittest.mock
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
 from httmock import HTTMock  # noqa
 from httmock import response  # noqa
 from httmock import urlmatch  # noqa
 import requests
 
 import gitlab
-from gitlab import *  # noqa
-from gitlab.v4.objects import *  # noqa
+from gitlab import Gitlab  # noqa
+from gitlab import GitlabHttpError  # noqa
+from gitlab import GitlabList  # noqa
+from gitlab import GitlabParsingError  # noqa
+from gitlab.v4.objects import CurrentUser  # noqa
+from gitlab.v4.objects import Group  # noqa
+from gitlab.v4.objects import Hook  # noqa
+from gitlab.v4.objects import Project  # noqa
+from gitlab.v4.objects import ProjectEnvironment  # noqa
+from gitlab.v4.objects import Todo  # noqa
+from gitlab.v4.objects import User  # noqa
+from gitlab.v4.objects import UserStatus  # noqa
 
 
 valid_config = b"""[global]
@@ -44,6 +62,284 @@ private_token = ABCDEF
 """
 
 
+_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+with open(os.path.join(_DATA_DIR, "todo.json"), "rb") as json_file:
+    _TODO_BYTES = json_file.read()
+_TODO_JSON = _json.loads(_TODO_BYTES)
+_TODO_FIRST_BYTES = _json.dumps(_TODO_JSON[0])
+
+_JSON_HEADERS = types.MappingProxyType({"content-type": "application/json"})
+_OCTET_HEADERS = types.MappingProxyType({"content-type": "application/octet-stream"})
+_PROJECT_LIST_HEADERS = types.MappingProxyType(
+    {"content-type": "application/json", "X-Total": 1}
+)
+_PAGE_1_HEADERS = types.MappingProxyType(
+    {
+        "content-type": "application/json",
+        "X-Page": 1,
+        "X-Next-Page": 2,
+        "X-Per-Page": 1,
+        "X-Total-Pages": 2,
+        "X-Total": 2,
+        "Link": ("<http://localhost/api/v4/tests?per_page=1&page=2>;" ' rel="next"'),
+    }
+)
+_PAGE_2_HEADERS = types.MappingProxyType(
+    {
+        "content-type": "application/json",
+        "X-Page": 2,
+        "X-Next-Page": 2,
+        "X-Per-Page": 1,
+        "X-Total-Pages": 2,
+        "X-Total": 2,
+    }
+)
+
+
+# Paths shared by several callbacks, compiled once for all of them
+_PROJECTS_PATH = re.compile(r"/api/v4/projects$")
+_NOT_THERE_PATH = re.compile(r"/api/v4/not_there$")
+
+_PAGE_1_BODY = b'[{"a": "b"}]'
+_PAGE_2_BODY = b'[{"c": "d"}]'
+
+_PROJECT_LIST_BODY = b'[{"name": "project1"}]'
+_PROJECT1_BODY = b'{"name": "project1"}'
+_INVALID_BODY = b'["name": "project1"]'
+_NOT_THERE_BODY = b"Here is why it failed"
+_RAW_BODY = b"content"
+_DELETE_BODY = b"true"
+
+_HOOK_BODY = b'{"url": "testurl", "id": 1}'
+_PROJECT_BODY = b'{"name": "name", "id": 1}'
+_ENVIRONMENT_BODY = (
+    b'{"name": "environment_name", "id": 1, "last_deployment": "sometime"}'
+)
+_GROUP_BODY = b'{"name": "name", "id": 1, "path": "path"}'
+_ISSUES_BODY = b'[{"name": "name", "id": 1}, {"name": "other_name", "id": 2}]'
+_USER_BODY = (
+    b'{"name": "name", "id": 1, "password": "password", '
+    b'"username": "username", "email": "email"}'
+)
+_USER_STATUS_BODY = (
+    b'{"message": "test", "message_html": "<h1>Message</h1>", "emoji": "thumbsup"}'
+)
+_SUBMODULE_BODY = b"""{
+"id": "ed899a2f4b50b4370feeea94676502b42383c746",
+"short_id": "ed899a2f4b5",
+"title": "Message",
+"author_name": "Author",
+"author_email": "author@example.com",
+"committer_name": "Author",
+"committer_email": "author@example.com",
+"created_at": "2018-09-20T09:26:24.000-07:00",
+"message": "Message",
+"parent_ids": [ "ae1d9fb46aa2b07ee9836d49862ec4e2c46fbbba" ],
+"committed_date": "2018-09-20T09:26:24.000-07:00",
+"authored_date": "2018-09-20T09:26:24.000-07:00",
+"status": null}"""
+
+# Canned responses for the retry tests. http_request only reads them, so the
+# same object can be returned several times, even within one test.
+_R429 = response(429)
+_R429_RA60 = response(429, headers={"Retry-After": "60"})
+_R429_RA180 = response(429, headers={"Retry-After": "180"})
+_R200 = response(200)
+
+
+@functools.lru_cache(maxsize=64)
+def _prebuilt_response(status_code, content):
+    return response(status_code, content, _JSON_HEADERS, None, 5)
+
+
+def _json_response(status_code, content, request):
+    """Return a copy of the prebuilt JSON response, bound to ``request``."""
+    resp = copy.copy(_prebuilt_response(status_code, content))
+    resp.request = request
+    resp.url = request.url
+    return resp
+
+
+@urlmatch(scheme="http", netloc="localhost", path="/api/v4/tests", method="get")
+def resp_list_page_1(url, request):
+    return response(200, _PAGE_1_BODY, _PAGE_1_HEADERS, None, 5, request)
+
+
+@urlmatch(
+    scheme="http",
+    netloc="localhost",
+    path="/api/v4/tests",
+    method="get",
+    query=r".*page=2",
+)
+def resp_list_page_2(url, request):
+    return response(200, _PAGE_2_BODY, _PAGE_2_HEADERS, None, 5, request)
+
+
+@urlmatch(scheme="http", netloc="localhost", path=_PROJECTS_PATH, method="get")
+def resp_list_projects(url, request):
+    return response(200, _PROJECT_LIST_BODY, _PROJECT_LIST_HEADERS, None, 5, request)
+
+
+def _by_verb(callback, path, verbs):
+    """Return ``callback`` registered for ``path``, keyed by HTTP verb."""
+    handlers = {}
+    for verb in verbs:
+        match = urlmatch(scheme="http", netloc="localhost", path=path, method=verb)
+        handlers[verb] = match(callback)
+    return handlers
+
+
+def _resp_project(url, request):
+    return _json_response(200, _PROJECT1_BODY, request)
+
+
+def _resp_invalid_data(url, request):
+    return _json_response(200, _INVALID_BODY, request)
+
+
+def _resp_not_there(url, request):
+    return response(404, _NOT_THERE_BODY, {}, None, 5, request)
+
+
+resp_projects = _by_verb(_resp_project, _PROJECTS_PATH, ("get", "post", "put"))
+resp_invalid_data = _by_verb(_resp_invalid_data, _PROJECTS_PATH, ("get", "post", "put"))
+resp_not_there = _by_verb(
+    _resp_not_there, _NOT_THERE_PATH, ("get", "post", "put", "delete")
+)
+
+
+@urlmatch(scheme="http", netloc="localhost", path=_PROJECTS_PATH, method="get")
+def resp_get_projects_raw(url, request):
+    return response(200, _RAW_BODY, _OCTET_HEADERS, None, 5, request)
+
+
+@urlmatch(scheme="http", netloc="localhost", path=_PROJECTS_PATH, method="delete")
+def resp_delete_projects(url, request):
+    return _json_response(200, _DELETE_BODY, request)
+
+
+@urlmatch(scheme="http", netloc="localhost", path="/api/v4/hooks/1", method="get")
+def resp_get_hook(url, request):
+    return _json_response(200, _HOOK_BODY, request)
+
+
+@urlmatch(scheme="http", netloc="localhost", path="/api/v4/projects/1$", method="get")
+def resp_get_project(url, request):
+    return _json_response(200, _PROJECT_BODY, request)
+
+
+@urlmatch(
+    scheme="http",
+    netloc="localhost",
+    path="/api/v4/projects/1/environments/1",
+    method="get",
+)
+def resp_get_environment(url, request):
+    return _json_response(200, _ENVIRONMENT_BODY, request)
+
+
+@urlmatch(scheme="http", netloc="localhost", path="/api/v4/groups/1", method="get")
+def resp_get_group(url, request):
+    return _json_response(200, _GROUP_BODY, request)
+
+
+@urlmatch(scheme="http", netloc="localhost", path="/api/v4/issues", method="get")
+def resp_list_issues(url, request):
+    return _json_response(200, _ISSUES_BODY, request)
+
+
+@urlmatch(scheme="http", netloc="localhost", path="/api/v4/users/1", method="get")
+def resp_get_user(url, request):
+    return _json_response(200, _USER_BODY, request)
+
+
+@urlmatch(
+    scheme="http",
+    netloc="localhost",
+    path="/api/v4/users/1/status",
+    method="get",
+)
+def resp_get_user_status(url, request):
+    return _json_response(200, _USER_STATUS_BODY, request)
+
+
+@urlmatch(
+    scheme="http",
+    netloc="localhost",
+    path="/api/v4/users/1/activate",
+    method="post",
+)
+def resp_activate(url, request):
+    return response(201, {}, _JSON_HEADERS, None, 5, request)
+
+
+@urlmatch(
+    scheme="http",
+    netloc="localhost",
+    path="/api/v4/users/1/deactivate",
+    method="post",
+)
+def resp_deactivate(url, request):
+    return response(201, {}, _JSON_HEADERS, None, 5, request)
+
+
+@urlmatch(scheme="http", netloc="localhost", path="/api/v4/todos", method="get")
+def resp_list_todos(url, request):
+    return _json_response(200, _TODO_BYTES, request)
+
+
+@urlmatch(
+    scheme="http",
+    netloc="localhost",
+    path="/api/v4/todos/102/mark_as_done",
+    method="post",
+)
+def resp_mark_todo_as_done(url, request):
+    return _json_response(200, _TODO_FIRST_BYTES, request)
+
+
+@urlmatch(
+    scheme="http",
+    netloc="localhost",
+    path="/api/v4/todos/mark_as_done",
+    method="post",
+)
+def resp_mark_all_todos_as_done(url, request):
+    return response(204, {}, _JSON_HEADERS, None, 5, request)
+
+
+@urlmatch(
+    scheme="http",
+    netloc="localhost",
+    path="/api/v4/projects/1/repository/submodules/foo%2Fbar",
+    method="put",
+)
+def resp_update_submodule(url, request):
+    return _json_response(200, _SUBMODULE_BODY, request)
+
+
+_session = None
+_sleep_patcher = unittest.mock.patch("gitlab.time.sleep", name="sleep mock")
+_sleep_mock = None
+
+
+def setUpModule():
+    # A single session is enough for the mocked transport, share it between
+    # the Gitlab instances of the module
+    global _session, _sleep_mock
+    _session = requests.Session()
+    # No test should really sleep, the tests that check the sleeps reset the
+    # mock in their setUp
+    _sleep_mock = _sleep_patcher.start()
+
+
+def tearDownModule():
+    _sleep_patcher.stop()
+    _session.close()
+
+
 class TestSanitize(unittest.TestCase):
     def test_do_nothing(self):
         self.assertEqual(1, gitlab._sanitize(1))
@@ -60,71 +356,43 @@ class TestSanitize(unittest.TestCase):
 
 
 class TestGitlabList(unittest.TestCase):
-    def setUp(self):
-        self.gl = Gitlab(
-            "http://localhost", private_token="private_token", api_version=4
+    @classmethod
+    def setUpClass(cls):
+        cls.gl = Gitlab(
+            "http://localhost",
+            private_token="private_token",
+            api_version=4,
+            session=_session,
         )
 
     def test_build_list(self):
-        @urlmatch(scheme="http", netloc="localhost", path="/api/v4/tests", method="get")
-        def resp_1(url, request):
-            headers = {
-                "content-type": "application/json",
-                "X-Page": 1,
-                "X-Next-Page": 2,
-                "X-Per-Page": 1,
-                "X-Total-Pages": 2,
-                "X-Total": 2,
-                "Link": (
-                    "<http://localhost/api/v4/tests?per_page=1&page=2>;" ' rel="next"'
-                ),
-            }
-            content = '[{"a": "b"}]'
-            return response(200, content, headers, None, 5, request)
-
-        @urlmatch(
-            scheme="http",
-            netloc="localhost",
-            path="/api/v4/tests",
-            method="get",
-            query=r".*page=2",
-        )
-        def resp_2(url, request):
-            headers = {
-                "content-type": "application/json",
-                "X-Page": 2,
-                "X-Next-Page": 2,
-                "X-Per-Page": 1,
-                "X-Total-Pages": 2,
-                "X-Total": 2,
-            }
-            content = '[{"c": "d"}]'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_1):
+        eq = self.assertEqual
+        with HTTMock(resp_list_page_1):
             obj = self.gl.http_list("/tests", as_list=False)
-            self.assertEqual(len(obj), 2)
-            self.assertEqual(
-                obj._next_url, "http://localhost/api/v4/tests?per_page=1&page=2"
-            )
-            self.assertEqual(obj.current_page, 1)
-            self.assertEqual(obj.prev_page, None)
-            self.assertEqual(obj.next_page, 2)
-            self.assertEqual(obj.per_page, 1)
-            self.assertEqual(obj.total_pages, 2)
-            self.assertEqual(obj.total, 2)
-
-            with HTTMock(resp_2):
+            eq(len(obj), 2)
+            eq(obj._next_url, "http://localhost/api/v4/tests?per_page=1&page=2")
+            eq(obj.current_page, 1)
+            eq(obj.prev_page, None)
+            eq(obj.next_page, 2)
+            eq(obj.per_page, 1)
+            eq(obj.total_pages, 2)
+            eq(obj.total, 2)
+
+            with HTTMock(resp_list_page_2):
                 l = list(obj)
-                self.assertEqual(len(l), 2)
-                self.assertEqual(l[0]["a"], "b")
-                self.assertEqual(l[1]["c"], "d")
+                eq(len(l), 2)
+                eq(l[0]["a"], "b")
+                eq(l[1]["c"], "d")
 
 
 class TestGitlabHttpMethods(unittest.TestCase):
-    def setUp(self):
-        self.gl = Gitlab(
-            "http://localhost", private_token="private_token", api_version=4
+    @classmethod
+    def setUpClass(cls):
+        cls.gl = Gitlab(
+            "http://localhost",
+            private_token="private_token",
+            api_version=4,
+            session=_session,
         )
 
     def test_build_url(self):
@@ -136,227 +404,79 @@ class TestGitlabHttpMethods(unittest.TestCase):
         self.assertEqual(r, "http://localhost/api/v4/projects")
 
     def test_http_request(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="get"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = '[{"name": "project1"}]'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
+        with HTTMock(resp_list_projects):
             http_r = self.gl.http_request("get", "/projects")
-            http_r.json()
-            self.assertEqual(http_r.status_code, 200)
+        self.assertEqual(http_r.status_code, 200)
+        self.assertEqual(_json.loads(http_r.content)[0]["name"], "project1")
 
     def test_http_request_404(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/not_there", method="get"
-        )
-        def resp_cont(url, request):
-            content = {"Here is wh it failed"}
-            return response(404, content, {}, None, 5, request)
-
-        with HTTMock(resp_cont):
+        with HTTMock(resp_not_there["get"]):
             self.assertRaises(
                 GitlabHttpError, self.gl.http_request, "get", "/not_there"
             )
 
-    def test_get_request(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="get"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"name": "project1"}'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
-            result = self.gl.http_get("/projects")
-            self.assertIsInstance(result, dict)
-            self.assertEqual(result["name"], "project1")
-
     def test_get_request_raw(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="get"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/octet-stream"}
-            content = "content"
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
+        with HTTMock(resp_get_projects_raw):
             result = self.gl.http_get("/projects")
             self.assertEqual(result.content.decode("utf-8"), "content")
 
-    def test_get_request_404(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/not_there", method="get"
-        )
-        def resp_cont(url, request):
-            content = {"Here is wh it failed"}
-            return response(404, content, {}, None, 5, request)
-
-        with HTTMock(resp_cont):
-            self.assertRaises(GitlabHttpError, self.gl.http_get, "/not_there")
-
-    def test_get_request_invalid_data(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="get"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = '["name": "project1"]'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
-            self.assertRaises(GitlabParsingError, self.gl.http_get, "/projects")
-
     def test_list_request(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="get"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json", "X-Total": 1}
-            content = '[{"name": "project1"}]'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
+        with HTTMock(resp_list_projects):
             result = self.gl.http_list("/projects", as_list=True)
             self.assertIsInstance(result, list)
             self.assertEqual(len(result), 1)
 
-        with HTTMock(resp_cont):
             result = self.gl.http_list("/projects", as_list=False)
             self.assertIsInstance(result, GitlabList)
             self.assertEqual(len(result), 1)
 
-        with HTTMock(resp_cont):
             result = self.gl.http_list("/projects", all=True)
             self.assertIsInstance(result, list)
             self.assertEqual(len(result), 1)
 
-    def test_list_request_404(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/not_there", method="get"
-        )
-        def resp_cont(url, request):
-            content = {"Here is why it failed"}
-            return response(404, content, {}, None, 5, request)
-
-        with HTTMock(resp_cont):
-            self.assertRaises(GitlabHttpError, self.gl.http_list, "/not_there")
-
-    def test_list_request_invalid_data(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="get"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = '["name": "project1"]'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
-            self.assertRaises(GitlabParsingError, self.gl.http_list, "/projects")
-
-    def test_post_request(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="post"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"name": "project1"}'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
-            result = self.gl.http_post("/projects")
-            self.assertIsInstance(result, dict)
-            self.assertEqual(result["name"], "project1")
-
-    def test_post_request_404(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/not_there", method="post"
-        )
-        def resp_cont(url, request):
-            content = {"Here is wh it failed"}
-            return response(404, content, {}, None, 5, request)
-
-        with HTTMock(resp_cont):
-            self.assertRaises(GitlabHttpError, self.gl.http_post, "/not_there")
-
-    def test_post_request_invalid_data(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="post"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = '["name": "project1"]'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
-            self.assertRaises(GitlabParsingError, self.gl.http_post, "/projects")
-
-    def test_put_request(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="put"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"name": "project1"}'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
-            result = self.gl.http_put("/projects")
-            self.assertIsInstance(result, dict)
-            self.assertEqual(result["name"], "project1")
-
-    def test_put_request_404(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/not_there", method="put"
-        )
-        def resp_cont(url, request):
-            content = {"Here is wh it failed"}
-            return response(404, content, {}, None, 5, request)
-
-        with HTTMock(resp_cont):
-            self.assertRaises(GitlabHttpError, self.gl.http_put, "/not_there")
-
-    def test_put_request_invalid_data(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="put"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = '["name": "project1"]'
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
-            self.assertRaises(GitlabParsingError, self.gl.http_put, "/projects")
-
     def test_delete_request(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects", method="delete"
-        )
-        def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = "true"
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_cont):
+        with HTTMock(resp_delete_projects):
             result = self.gl.http_delete("/projects")
             self.assertIsInstance(result, requests.Response)
             self.assertEqual(result.json(), True)
 
-    def test_delete_request_404(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/not_there", method="delete"
-        )
-        def resp_cont(url, request):
-            content = {"Here is wh it failed"}
-            return response(404, content, {}, None, 5, request)
-
-        with HTTMock(resp_cont):
-            self.assertRaises(GitlabHttpError, self.gl.http_delete, "/not_there")
+    def test_http_methods(self):
+        gl = self.gl
+        for verb, method in (
+            ("get", gl.http_get),
+            ("post", gl.http_post),
+            ("put", gl.http_put),
+        ):
+            with self.subTest(method=method.__name__):
+                with HTTMock(resp_projects[verb]):
+                    result = method("/projects")
+                self.assertIsInstance(result, dict)
+                self.assertEqual(result["name"], "project1")
+
+    def test_http_methods_404(self):
+        gl = self.gl
+        for verb, method in (
+            ("get", gl.http_get),
+            ("get", gl.http_list),
+            ("post", gl.http_post),
+            ("put", gl.http_put),
+            ("delete", gl.http_delete),
+        ):
+            with self.subTest(method=method.__name__):
+                with HTTMock(resp_not_there[verb]):
+                    self.assertRaises(GitlabHttpError, method, "/not_there")
+
+    def test_http_methods_invalid_data(self):
+        gl = self.gl
+        for verb, method in (
+            ("get", gl.http_get),
+            ("get", gl.http_list),
+            ("post", gl.http_post),
+            ("put", gl.http_put),
+        ):
+            with self.subTest(method=method.__name__):
+                with HTTMock(resp_invalid_data[verb]):
+                    self.assertRaises(GitlabParsingError, method, "/projects")
 
 
 class TestGitlabAuth(unittest.TestCase):
@@ -396,36 +516,40 @@ class TestGitlabAuth(unittest.TestCase):
         )
 
     def test_private_token_auth(self):
+        eq = self.assertEqual
         gl = Gitlab("http://localhost", private_token="private_token", api_version="4")
-        self.assertEqual(gl.private_token, "private_token")
-        self.assertEqual(gl.oauth_token, None)
-        self.assertEqual(gl.job_token, None)
-        self.assertEqual(gl._http_auth, None)
+        eq(gl.private_token, "private_token")
+        eq(gl.oauth_token, None)
+        eq(gl.job_token, None)
+        eq(gl._http_auth, None)
         self.assertNotIn("Authorization", gl.headers)
-        self.assertEqual(gl.headers["PRIVATE-TOKEN"], "private_token")
+        eq(gl.headers["PRIVATE-TOKEN"], "private_token")
         self.assertNotIn("JOB-TOKEN", gl.headers)
 
     def test_oauth_token_auth(self):
+        eq = self.assertEqual
         gl = Gitlab("http://localhost", oauth_token="oauth_token", api_version="4")
-        self.assertEqual(gl.private_token, None)
-        self.assertEqual(gl.oauth_token, "oauth_token")
-        self.assertEqual(gl.job_token, None)
-        self.assertEqual(gl._http_auth, None)
-        self.assertEqual(gl.headers["Authorization"], "Bearer oauth_token")
+        eq(gl.private_token, None)
+        eq(gl.oauth_token, "oauth_token")
+        eq(gl.job_token, None)
+        eq(gl._http_auth, None)
+        eq(gl.headers["Authorization"], "Bearer oauth_token")
         self.assertNotIn("PRIVATE-TOKEN", gl.headers)
         self.assertNotIn("JOB-TOKEN", gl.headers)
 
     def test_job_token_auth(self):
+        eq = self.assertEqual
         gl = Gitlab("http://localhost", job_token="CI_JOB_TOKEN", api_version="4")
-        self.assertEqual(gl.private_token, None)
-        self.assertEqual(gl.oauth_token, None)
-        self.assertEqual(gl.job_token, "CI_JOB_TOKEN")
-        self.assertEqual(gl._http_auth, None)
+        eq(gl.private_token, None)
+        eq(gl.oauth_token, None)
+        eq(gl.job_token, "CI_JOB_TOKEN")
+        eq(gl._http_auth, None)
         self.assertNotIn("Authorization", gl.headers)
         self.assertNotIn("PRIVATE-TOKEN", gl.headers)
-        self.assertEqual(gl.headers["JOB-TOKEN"], "CI_JOB_TOKEN")
+        eq(gl.headers["JOB-TOKEN"], "CI_JOB_TOKEN")
 
     def test_http_auth(self):
+        eq = self.assertEqual
         gl = Gitlab(
             "http://localhost",
             private_token="private_token",
@@ -433,26 +557,35 @@ class TestGitlabAuth(unittest.TestCase):
             http_password="bar",
             api_version="4",
         )
-        self.assertEqual(gl.private_token, "private_token")
-        self.assertEqual(gl.oauth_token, None)
-        self.assertEqual(gl.job_token, None)
+        eq(gl.private_token, "private_token")
+        eq(gl.oauth_token, None)
+        eq(gl.job_token, None)
         self.assertIsInstance(gl._http_auth, requests.auth.HTTPBasicAuth)
-        self.assertEqual(gl.headers["PRIVATE-TOKEN"], "private_token")
+        eq(gl.headers["PRIVATE-TOKEN"], "private_token")
         self.assertNotIn("Authorization", gl.headers)
 
 
 class TestGitlab(unittest.TestCase):
-    def setUp(self):
-        self.gl = Gitlab(
+    @classmethod
+    def setUpClass(cls):
+        cls.gl = Gitlab(
             "http://localhost",
             private_token="private_token",
             ssl_verify=True,
             api_version=4,
+            session=_session,
         )
+        with tempfile.NamedTemporaryFile(delete=False) as config_file:
+            config_file.write(valid_config)
+        cls._config_path = config_file.name
+
+    @classmethod
+    def tearDownClass(cls):
+        os.unlink(cls._config_path)
 
     def test_pickability(self):
         original_gl_objects = self.gl._objects
-        pickled = pickle.dumps(self.gl)
+        pickled = pickle.dumps(self.gl, protocol=pickle.HIGHEST_PROTOCOL)
         unpickled = pickle.loads(pickled)
         self.assertIsInstance(unpickled, Gitlab)
         self.assertTrue(hasattr(unpickled, "_objects"))
@@ -461,30 +594,22 @@ class TestGitlab(unittest.TestCase):
     def test_token_auth(self, callback=None):
         name = "username"
         id_ = 1
+        content = '{{"id": {0:d}, "username": "{1:s}"}}'.format(id_, name).encode(
+            "utf-8"
+        )
 
         @urlmatch(scheme="http", netloc="localhost", path="/api/v4/user", method="get")
         def resp_cont(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{{"id": {0:d}, "username": "{1:s}"}}'.format(id_, name).encode(
-                "utf-8"
-            )
-            return response(200, content, headers, None, 5, request)
+            return _json_response(200, content, request)
 
         with HTTMock(resp_cont):
             self.gl.auth()
+        self.addCleanup(delattr, self.gl, "user")
         self.assertEqual(self.gl.user.username, name)
         self.assertEqual(self.gl.user.id, id_)
         self.assertIsInstance(self.gl.user, CurrentUser)
 
     def test_hooks(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/hooks/1", method="get"
-        )
-        def resp_get_hook(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"url": "testurl", "id": 1}'.encode("utf-8")
-            return response(200, content, headers, None, 5, request)
-
         with HTTMock(resp_get_hook):
             data = self.gl.hooks.get(1)
             self.assertIsInstance(data, Hook)
@@ -492,14 +617,6 @@ class TestGitlab(unittest.TestCase):
             self.assertEqual(data.id, 1)
 
     def test_projects(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects/1", method="get"
-        )
-        def resp_get_project(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"name": "name", "id": 1}'.encode("utf-8")
-            return response(200, content, headers, None, 5, request)
-
         with HTTMock(resp_get_project):
             data = self.gl.projects.get(1)
             self.assertIsInstance(data, Project)
@@ -507,27 +624,6 @@ class TestGitlab(unittest.TestCase):
             self.assertEqual(data.id, 1)
 
     def test_project_environments(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects/1$", method="get"
-        )
-        def resp_get_project(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"name": "name", "id": 1}'.encode("utf-8")
-            return response(200, content, headers, None, 5, request)
-
-        @urlmatch(
-            scheme="http",
-            netloc="localhost",
-            path="/api/v4/projects/1/environments/1",
-            method="get",
-        )
-        def resp_get_environment(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"name": "environment_name", "id": 1, "last_deployment": "sometime"}'.encode(
-                "utf-8"
-            )
-            return response(200, content, headers, None, 5, request)
-
         with HTTMock(resp_get_project, resp_get_environment):
             project = self.gl.projects.get(1)
             environment = project.environments.get(1)
@@ -537,15 +633,6 @@ class TestGitlab(unittest.TestCase):
             self.assertEqual(environment.name, "environment_name")
 
     def test_groups(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/groups/1", method="get"
-        )
-        def resp_get_group(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"name": "name", "id": 1, "path": "path"}'
-            content = content.encode("utf-8")
-            return response(200, content, headers, None, 5, request)
-
         with HTTMock(resp_get_group):
             data = self.gl.groups.get(1)
             self.assertIsInstance(data, Group)
@@ -554,51 +641,20 @@ class TestGitlab(unittest.TestCase):
             self.assertEqual(data.id, 1)
 
     def test_issues(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/issues", method="get"
-        )
-        def resp_get_issue(url, request):
-            headers = {"content-type": "application/json"}
-            content = '[{"name": "name", "id": 1}, ' '{"name": "other_name", "id": 2}]'
-            content = content.encode("utf-8")
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_get_issue):
+        with HTTMock(resp_list_issues):
             data = self.gl.issues.list()
             self.assertEqual(data[1].id, 2)
             self.assertEqual(data[1].name, "other_name")
 
-    @urlmatch(scheme="http", netloc="localhost", path="/api/v4/users/1", method="get")
-    def resp_get_user(self, url, request):
-        headers = {"content-type": "application/json"}
-        content = (
-            '{"name": "name", "id": 1, "password": "password", '
-            '"username": "username", "email": "email"}'
-        )
-        content = content.encode("utf-8")
-        return response(200, content, headers, None, 5, request)
-
     def test_users(self):
-        with HTTMock(self.resp_get_user):
+        with HTTMock(resp_get_user):
             user = self.gl.users.get(1)
             self.assertIsInstance(user, User)
             self.assertEqual(user.name, "name")
             self.assertEqual(user.id, 1)
 
     def test_user_status(self):
-        @urlmatch(
-            scheme="http",
-            netloc="localhost",
-            path="/api/v4/users/1/status",
-            method="get",
-        )
-        def resp_get_user_status(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"message": "test", "message_html": "<h1>Message</h1>", "emoji": "thumbsup"}'
-            content = content.encode("utf-8")
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(self.resp_get_user):
+        with HTTMock(resp_get_user):
             user = self.gl.users.get(1)
         with HTTMock(resp_get_user_status):
             status = user.status.get()
@@ -607,54 +663,22 @@ class TestGitlab(unittest.TestCase):
             self.assertEqual(status.emoji, "thumbsup")
 
     def test_todo(self):
-        with open(os.path.dirname(__file__) + "/data/todo.json", "r") as json_file:
-            todo_content = json_file.read()
-            json_content = json.loads(todo_content)
-            encoded_content = todo_content.encode("utf-8")
-
-        @urlmatch(scheme="http", netloc="localhost", path="/api/v4/todos", method="get")
-        def resp_get_todo(url, request):
-            headers = {"content-type": "application/json"}
-            return response(200, encoded_content, headers, None, 5, request)
-
-        @urlmatch(
-            scheme="http",
-            netloc="localhost",
-            path="/api/v4/todos/102/mark_as_done",
-            method="post",
-        )
-        def resp_mark_as_done(url, request):
-            headers = {"content-type": "application/json"}
-            single_todo = json.dumps(json_content[0])
-            content = single_todo.encode("utf-8")
-            return response(200, content, headers, None, 5, request)
-
-        with HTTMock(resp_get_todo):
+        with HTTMock(resp_list_todos):
             todo = self.gl.todos.list()[0]
             self.assertIsInstance(todo, Todo)
             self.assertEqual(todo.id, 102)
             self.assertEqual(todo.target_type, "MergeRequest")
             self.assertEqual(todo.target["assignee"]["username"], "root")
-            with HTTMock(resp_mark_as_done):
+            with HTTMock(resp_mark_todo_as_done):
                 todo.mark_as_done()
 
     def test_todo_mark_all_as_done(self):
-        @urlmatch(
-            scheme="http",
-            netloc="localhost",
-            path="/api/v4/todos/mark_as_done",
-            method="post",
-        )
-        def resp_mark_all_as_done(url, request):
-            headers = {"content-type": "application/json"}
-            return response(204, {}, headers, None, 5, request)
-
-        with HTTMock(resp_mark_all_as_done):
+        with HTTMock(resp_mark_all_todos_as_done):
             self.gl.todos.mark_all_as_done()
 
     def test_deployment(self):
-        content = '{"id": 42, "status": "success", "ref": "master"}'
-        json_content = json.loads(content)
+        content = b'{"id": 42, "status": "success", "ref": "master"}'
+        json_content = _json.loads(content)
 
         @urlmatch(
             scheme="http",
@@ -663,8 +687,7 @@ class TestGitlab(unittest.TestCase):
             method="post",
         )
         def resp_deployment_create(url, request):
-            headers = {"content-type": "application/json"}
-            return response(200, json_content, headers, None, 5, request)
+            return response(200, json_content, _JSON_HEADERS, None, 5, request)
 
         @urlmatch(
             scheme="http",
@@ -673,8 +696,7 @@ class TestGitlab(unittest.TestCase):
             method="put",
         )
         def resp_deployment_update(url, request):
-            headers = {"content-type": "application/json"}
-            return response(200, json_content, headers, None, 5, request)
+            return response(200, json_content, _JSON_HEADERS, None, 5, request)
 
         with HTTMock(resp_deployment_create):
             deployment = self.gl.projects.get(1, lazy=True).deployments.create(
@@ -697,69 +719,17 @@ class TestGitlab(unittest.TestCase):
             self.assertEqual(deployment.status, "failed")
 
     def test_user_activate_deactivate(self):
-        @urlmatch(
-            scheme="http",
-            netloc="localhost",
-            path="/api/v4/users/1/activate",
-            method="post",
-        )
-        def resp_activate(url, request):
-            headers = {"content-type": "application/json"}
-            return response(201, {}, headers, None, 5, request)
-
-        @urlmatch(
-            scheme="http",
-            netloc="localhost",
-            path="/api/v4/users/1/deactivate",
-            method="post",
-        )
-        def resp_deactivate(url, request):
-            headers = {"content-type": "application/json"}
-            return response(201, {}, headers, None, 5, request)
-
-        with HTTMock(resp_activate), HTTMock(resp_deactivate):
+        with HTTMock(resp_activate, resp_deactivate):
             self.gl.users.get(1, lazy=True).activate()
             self.gl.users.get(1, lazy=True).deactivate()
 
     def test_update_submodule(self):
-        @urlmatch(
-            scheme="http", netloc="localhost", path="/api/v4/projects/1$", method="get"
-        )
-        def resp_get_project(url, request):
-            headers = {"content-type": "application/json"}
-            content = '{"name": "name", "id": 1}'.encode("utf-8")
-            return response(200, content, headers, None, 5, request)
-
-        @urlmatch(
-            scheme="http",
-            netloc="localhost",
-            path="/api/v4/projects/1/repository/submodules/foo%2Fbar",
-            method="put",
-        )
-        def resp_update_submodule(url, request):
-            headers = {"content-type": "application/json"}
-            content = """{
-            "id": "ed899a2f4b50b4370feeea94676502b42383c746",
-            "short_id": "ed899a2f4b5",
-            "title": "Message",
-            "author_name": "Author",
-            "author_email": "author@example.com",
-            "committer_name": "Author",
-            "committer_email": "author@example.com",
-            "created_at": "2018-09-20T09:26:24.000-07:00",
-            "message": "Message",
-            "parent_ids": [ "ae1d9fb46aa2b07ee9836d49862ec4e2c46fbbba" ],
-            "committed_date": "2018-09-20T09:26:24.000-07:00",
-            "authored_date": "2018-09-20T09:26:24.000-07:00",
-            "status": null}"""
-            content = content.encode("utf-8")
-            return response(200, content, headers, None, 5, request)
-
+        eq = self.assertEqual
         with HTTMock(resp_get_project):
             project = self.gl.projects.get(1)
             self.assertIsInstance(project, Project)
-            self.assertEqual(project.name, "name")
-            self.assertEqual(project.id, 1)
+            eq(project.name, "name")
+            eq(project.id, 1)
         with HTTMock(resp_update_submodule):
             ret = project.update_submodule(
                 submodule="foo/bar",
@@ -768,28 +738,18 @@ class TestGitlab(unittest.TestCase):
                 commit_message="Message",
             )
             self.assertIsInstance(ret, dict)
-            self.assertEqual(ret["message"], "Message")
-            self.assertEqual(ret["id"], "ed899a2f4b50b4370feeea94676502b42383c746")
-
-    def _default_config(self):
-        fd, temp_path = tempfile.mkstemp()
-        os.write(fd, valid_config)
-        os.close(fd)
-        return temp_path
+            eq(ret["message"], "Message")
+            eq(ret["id"], "ed899a2f4b50b4370feeea94676502b42383c746")
 
     def test_from_config(self):
-        config_path = self._default_config()
-        gitlab.Gitlab.from_config("one", [config_path])
-        os.unlink(config_path)
+        gitlab.Gitlab.from_config("one", [self._config_path])
 
     def test_subclass_from_config(self):
         class MyGitlab(gitlab.Gitlab):
             pass
 
-        config_path = self._default_config()
-        gl = MyGitlab.from_config("one", [config_path])
+        gl = MyGitlab.from_config("one", [self._config_path])
         self.assertIsInstance(gl, MyGitlab)
-        os.unlink(config_path)
 
 
 class TestRetryWaitTime(unittest.TestCase):
@@ -798,117 +758,119 @@ class TestRetryWaitTime(unittest.TestCase):
         self.session_mock.prepare_request.return_value.url = "http://localhost"
         self.session_mock.merge_environment_settings.return_value = {}
 
-    @unittest.mock.patch("gitlab.time.sleep", name="sleep mock")
-    def test_default_retry_wait_time(self, sleep_mock):
-        self.gl = Gitlab(
+        self.sleep_mock = _sleep_mock
+        self.sleep_mock.reset_mock()
+        self.sleep_mock.side_effect = None
+
+    def _make_gl(self, **kwargs):
+        return Gitlab(
             "http://localhost",
             private_token="private_token",
             ssl_verify=True,
             api_version=4,
             session=self.session_mock,
-        )
-
-        self.session_mock.send.side_effect = [
-            response(429, headers={"Retry-After": "60"}),
-            response(429, headers={"Retry-After": "180"}),
-            response(429),
-            response(429),
-            response(200),
+            **kwargs
+        )
+
+    def test_retry_wait_time(self):
+        # ANY stands for a jittered exponential backoff delay
+        cases = [
+            (
+                "default",
+                {},
+                [_R429_RA60, _R429_RA180, _R429, _R429, _R200],
+                [30, 30, unittest.mock.ANY, unittest.mock.ANY],
+            ),
+            (
+                "max_retry_wait",
+                {"max_retry_wait": 120},
+                [_R429_RA60, _R429_RA180, _R200],
+                [60, 120],
+            ),
+            (
+                "no max_retry_wait",
+                {"max_retry_wait": None},
+                [_R429_RA60, _R429_RA180, _R429, _R200],
+                [60, 180, unittest.mock.ANY],
+            ),
+            (
+                "custom",
+                {"get_wait_time": unittest.mock.Mock(side_effect=[100, 200])},
+                [_R429_RA60, _R429, _R200],
+                [100, 200],
+            ),
         ]
+        for name, kwargs, responses, expected in cases:
+            with self.subTest(name):
+                self.sleep_mock.reset_mock()
+                self.session_mock.send.side_effect = responses
+                gl = self._make_gl(**kwargs)
 
-        http_r = self.gl.http_request("get", "/projects", max_retries=4)
-
-        self.assertEqual(http_r.status_code, 200)
-
-        self.assertEqual(
-            [
-                unittest.mock.call(60),
-                unittest.mock.call(180),
-                unittest.mock.call(unittest.mock.ANY),
-                unittest.mock.call(unittest.mock.ANY),
-            ],
-            sleep_mock.call_args_list,
-        )
-
-        self.assertAlmostEqual(
-            sleep_mock.call_args_list[2][0][0], 2 ** 2 * 0.1,
-        )
-
-        self.assertAlmostEqual(
-            sleep_mock.call_args_list[3][0][0], 2 ** 3 * 0.1,
-        )
+                http_r = gl.http_request(
+                    "get", "/projects", max_retries=len(responses) - 1
+                )
 
-    @unittest.mock.patch("gitlab.time.sleep", name="sleep mock")
-    def test_custom_retry_wait_time(self, sleep_mock):
-        self.gl = Gitlab(
-            "http://localhost",
-            private_token="private_token",
-            ssl_verify=True,
-            api_version=4,
-            session=self.session_mock,
-            get_wait_time=unittest.mock.Mock(side_effect=[100, 200]),
-        )
+                self.assertEqual(http_r.status_code, 200)
 
-        self.session_mock.send.side_effect = [
-            response(429, headers={"Retry-After": "60"}),
-            response(429),
-            response(200),
-        ]
+                calls = self.sleep_mock.call_args_list
+                self.assertEqual(len(calls), len(expected))
+                for retries, (call, wait_time) in enumerate(zip(calls, expected)):
+                    if wait_time is unittest.mock.ANY:
+                        self.assertGreaterEqual(call[0][0], 0)
+                        self.assertLessEqual(call[0][0], 2 ** retries * 0.1)
+                    else:
+                        self.assertEqual(call[0], (wait_time,))
 
-        http_r = self.gl.http_request("get", "/projects", max_retries=2)
+    def test_default_retry_wait_time_is_capped(self):
+        get_wait_time = gitlab.DefaultWaitTimeStrategy(max_retry_wait=1)
 
-        self.assertEqual(http_r.status_code, 200)
+        with unittest.mock.patch("gitlab.random.uniform") as uniform_mock:
+            get_wait_time(_R429, 10)
 
-        self.assertEqual(
-            [unittest.mock.call(100), unittest.mock.call(200),],
-            sleep_mock.call_args_list,
-        )
+        uniform_mock.assert_called_once_with(0, 1)
 
 
 class TestRequestThrottler(unittest.TestCase):
     def setUp(self):
         self.throttler = gitlab.RequestThrottler(5, 10)
 
-        monotonic_patcher = unittest.mock.patch(
-            "gitlab.time.monotonic", name="monotonic mock", return_value=0,
+        # gitlab.time is the stdlib module, so keep this patch to the test
+        # body: unittest reads the real perf_counter around it
+        perf_counter_patcher = unittest.mock.patch(
+            "gitlab.time.perf_counter", name="perf_counter mock", return_value=0
         )
-        self.monotonic_mock = monotonic_patcher.start()
-        self.addCleanup(monotonic_patcher.stop)
+        self.perf_counter_mock = perf_counter_patcher.start()
+        self.addCleanup(perf_counter_patcher.stop)
 
-        sleep_patcher = unittest.mock.patch(
-            "gitlab.time.sleep", name="sleep mock", side_effect=self._sleep,
-        )
-        self.sleep_mock = sleep_patcher.start()
-        self.addCleanup(sleep_patcher.stop)
+        self.sleep_mock = _sleep_mock
+        self.sleep_mock.reset_mock()
+        self.sleep_mock.side_effect = self._sleep
+        self.addCleanup(setattr, self.sleep_mock, "side_effect", None)
 
     def _sleep(self, sleep_time):
-        self.monotonic_mock.return_value += sleep_time
-
-    def test_throttling(self):
-        for _ in range(0, 5):
-            self.monotonic_mock.return_value += 1
-            self.throttler()
-
-        self.assertFalse(self.sleep_mock.called)
-        self.assertEqual([1, 2, 3, 4, 5], self.throttler.calls_within_period)
+        self.perf_counter_mock.return_value += sleep_time
 
-        self.monotonic_mock.return_value += 1
-        self.assertEqual(self.monotonic_mock.return_value, 6)
+    def _tick(self, delta, expect_sleep=None, window=None):
+        """Advance the clock by ``delta``, call the throttler and check it."""
+        self.perf_counter_mock.return_value += delta
         self.throttler()
 
-        self.sleep_mock.assert_called_once_with(6)
-        self.assertEqual(self.monotonic_mock.return_value, 12)
+        if expect_sleep is None:
+            self.assertFalse(self.sleep_mock.called)
+        else:
+            self.sleep_mock.assert_called_once_with(expect_sleep)
+            self.sleep_mock.reset_mock()
 
-        self.assertEqual([2, 3, 4, 5, 12], self.throttler.calls_within_period)
+        if window is not None:
+            self.assertEqual(window, list(self.throttler.calls_within_period))
 
-        self.sleep_mock.reset_mock()
+    def test_throttling(self):
+        for _ in range(0, 4):
+            self._tick(1)
+        self._tick(1, window=[1, 2, 3, 4, 5])
 
-        self.monotonic_mock.return_value += 1
-        self.throttler()
-        self.assertFalse(self.sleep_mock.called)
-        self.assertEqual([3, 4, 5, 12, 13], self.throttler.calls_within_period)
+        # The 6th call within 10 seconds waits until the 1st one expires
+        self._tick(1, expect_sleep=6, window=[2, 3, 4, 5, 12])
 
-        self.monotonic_mock.return_value = 100
-        self.throttler()
-        self.assertFalse(self.sleep_mock.called)
-        self.assertEqual([100], self.throttler.calls_within_period)
+        self._tick(1, window=[3, 4, 5, 12, 13])
+        self._tick(87, window=[100])